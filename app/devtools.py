@@ -0,0 +1,199 @@
+"""Developer commands for the labeler app.
+
+Run from the project root, e.g.::
+
+    python -m app.devtools profile_startup
+    python -m app.devtools check_metrics_parity
+"""
+import json
+import random
+import subprocess
+import sys
+from pathlib import Path
+
+project_root = Path().absolute()
+sys.path.append(str(project_root))
+
+from app.loadtest import PAGES, _page_script
+from app.utils import (
+    DIMENSIONS_DESCRIPTIONS,
+    build_metric_counters,
+    calculate_metrics,
+    ground_truth_dimensions,
+    metrics_from_counters,
+    micro_precision_recall_f1,
+    update_metric_counters,
+)
+
+HARNESS_MARKER = "-- harness --"
+RENDER_MARKER = "-- first render --"
+
+# Imports the page (run_name other than "__main__" skips main()), then renders it
+# once through AppTest. Imports logged between the markers belong to AppTest,
+# the ones after the last marker are those the page defers to its first render.
+PROFILE_SCRIPT = """
+import json, runpy, sys, time
+runpy.run_path({path!r}, run_name="__profile__")
+print({harness_marker!r}, file=sys.stderr, flush=True)
+
+import app.loadtest
+from streamlit.testing.v1 import AppTest
+AppTest.from_string("import streamlit as st; st.write('warm up')").run()
+print({render_marker!r}, file=sys.stderr, flush=True)
+
+at = AppTest.from_string({script!r}, default_timeout={timeout!r})
+started = time.perf_counter()
+at.run()
+elapsed = time.perf_counter() - started
+print(json.dumps({{"first_render_ms": 1000 * elapsed, "errors": [str(e.value) for e in at.exception]}}))
+"""
+
+
+def _parse_importtime(lines):
+    times = []
+    for line in lines:
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line[len("import time:"):].split("|")
+        # Nested imports keep their indentation so callers can tell them apart
+        times.append((module[1:].rstrip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def _profile_page(page: str, hypotheses_path: str, sampled_topics_path: str, timeout: float):
+    """Collect ``-X importtime`` output of a page's import and of its first render."""
+    pattern = PAGES[page][0]
+    code = PROFILE_SCRIPT.format(
+        path=str(next(project_root.glob(pattern))),
+        script=_page_script(page, hypotheses_path, sampled_topics_path),
+        harness_marker=HARNESS_MARKER,
+        render_marker=RENDER_MARKER,
+        timeout=timeout,
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=project_root,
+        capture_output=True,
+        text=True,
+    )
+
+    lines = result.stderr.splitlines()
+    harness = lines.index(HARNESS_MARKER) if HARNESS_MARKER in lines else len(lines)
+    render = lines.index(RENDER_MARKER) if RENDER_MARKER in lines else len(lines)
+    first_render = json.loads(result.stdout.splitlines()[-1]) if result.returncode == 0 and result.stdout else None
+    return _parse_importtime(lines[:harness]), _parse_importtime(lines[render + 1:]), first_render
+
+
+def _print_slowest(title: str, times: list, top: int):
+    # Modules imported directly are the ones without indentation
+    top_level = [t for t in times if not t[0].startswith(" ")]
+    print(f"  {title} (total {sum(t[2] for t in top_level) / 1000:.1f} ms)")
+    for module, _, cumulative_us in sorted(top_level, key=lambda t: -t[2])[:top]:
+        print(f"    {cumulative_us / 1000:9.1f} ms  {module}")
+
+
+def profile_startup(
+    top: int = 15,
+    pages: list[str] = list(PAGES),
+    hypotheses_path: str = None,
+    sampled_topics_path: str = None,
+    timeout: float = 60,
+):
+    """Report per-module import time for each page, and the imports and time of its first render.
+
+    Modules imported only when a feature is used, such as app.diff or
+    pyarrow.parquet, show up under the first render rather than the page import.
+
+    Args:
+        top: Number of slowest top-level imports to list per phase.
+        pages: Pages to profile, any of explorer, hypothesis_labeler and topics_labeler.
+        hypotheses_path: Hypotheses file, directory or glob, defaults to each page's default.
+        sampled_topics_path: Sampled topics file of the Topics labeler.
+        timeout: Seconds before the first render is considered hung.
+    """
+    for page in pages:
+        import_times, render_times, render = _profile_page(page, hypotheses_path, sampled_topics_path, timeout)
+
+        print(f"\n{page}")
+        _print_slowest("import", import_times, top)
+        if render is None:
+            print("  page failed to import, timings are incomplete")
+            continue
+        _print_slowest(f"first render {render['first_render_ms']:.1f} ms, deferred imports", render_times, top)
+        for error in render["errors"]:
+            print(f"  first render failed: {error}")
+
+
+def _random_dimensions(rng: random.Random, density: float):
+    return [dimension for dimension in DIMENSIONS_DESCRIPTIONS if rng.random() < density]
+
+
+def _check_close(trial: int, name: str, actual: dict, expected: dict):
+    if any(abs(actual[key] - expected[key]) > 1e-12 for key in ("precision", "recall", "f1")):
+        raise SystemExit(f"Trial {trial}: {name} {actual} != calculate_metrics {expected}")
+
+
+def check_metrics_parity(n_topics: int = 500, n_trials: int = 20, seed: int = 42):
+    """Check the app's metrics against their references on random labels.
+
+    The running counters the Topics labeler uses (build_metric_counters,
+    update_metric_counters, metrics_from_counters) are compared with
+    calculate_metrics, and the NumPy metrics behind calculate_metrics with
+    scikit-learn when it is installed.
+
+    Args:
+        n_topics: Topics per random label set.
+        n_trials: Number of random label sets to compare.
+        seed: Random seed.
+    """
+    rng = random.Random(seed)
+    for trial in range(n_trials):
+        density = rng.random()
+        # Topics missing from the run and labels of unknown topics are skipped by both
+        topics_data = [
+            {"id": str(i), "hypotheses": [{"dimension": d} for d in _random_dimensions(rng, density)]}
+            for i in range(n_topics)
+            if rng.random() < 0.9
+        ]
+        labeled_data = {str(i): _random_dimensions(rng, density) for i in range(n_topics) if rng.random() < 0.5}
+        true_dimensions = ground_truth_dimensions(topics_data)
+
+        counters = build_metric_counters(true_dimensions, labeled_data)
+        _check_close(trial, "build_metric_counters", metrics_from_counters(counters), calculate_metrics(topics_data, labeled_data))
+
+        # Relabel random topics one at a time, as the page does on each checkbox change
+        for _ in range(n_topics):
+            topic_id = str(rng.randrange(n_topics))
+            selection = _random_dimensions(rng, density)
+            update_metric_counters(counters, true_dimensions, topic_id, labeled_data.get(topic_id), selection)
+            labeled_data[topic_id] = selection
+        _check_close(trial, "update_metric_counters", metrics_from_counters(counters), calculate_metrics(topics_data, labeled_data))
+        if counters != build_metric_counters(true_dimensions, labeled_data):
+            raise SystemExit(f"Trial {trial}: updated counters differ from counters built from scratch")
+
+    print(f"Running counters match calculate_metrics on {n_trials} random label sets")
+
+    try:
+        from sklearn.metrics import precision_recall_fscore_support
+    except ImportError:
+        print("scikit-learn is not installed, skipped the comparison with it")
+        return
+
+    n_dimensions = len(DIMENSIONS_DESCRIPTIONS)
+    for trial in range(n_trials):
+        density = rng.random()
+        y_true = [[int(rng.random() < density) for _ in range(n_dimensions)] for _ in range(n_topics)]
+        y_pred = [[int(rng.random() < density) for _ in range(n_dimensions)] for _ in range(n_topics)]
+
+        expected = precision_recall_fscore_support(y_true, y_pred, average="micro", zero_division=0)[:3]
+        actual = micro_precision_recall_f1(y_true, y_pred)
+        if any(abs(a - e) > 1e-12 for a, e in zip(actual, expected)):
+            raise SystemExit(f"Trial {trial}: numpy {actual} != sklearn {tuple(expected)}")
+
+    print(f"Metrics match scikit-learn on {n_trials} random matrices")
+
+
+if __name__ == "__main__":
+    from jsonargparse import CLI
+
+    CLI([profile_startup, check_metrics_parity])
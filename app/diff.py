@@ -0,0 +1,183 @@
+"""Compare the hypotheses of two runs for the topic ids they share.
+
+Hypotheses are matched on (id, dimension). For each match the content is
+compared through vectorized fingerprints, so a whole run is compared at once.
+Large runs are first hash-partitioned on id into temporary files and joined
+one partition at a time, which keeps memory bounded by the partition size::
+
+    python -m app.diff "runs/old/*.jsonl" "runs/new/*.jsonl" --output changes.jsonl
+"""
+import json
+import tempfile
+import zlib
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from app.utils import (
+    DIMENSIONS_DESCRIPTIONS,
+    dataset_files,
+    dataset_version,
+    list_runs,
+    load_jsonl_results,
+    topic_hypotheses,
+)
+
+ROW_COLUMNS = ["id", "dimension", "ideological_side", "hypothesis"]
+STAT_COLUMNS = ["added", "removed", "side_flipped", "rewritten", "unchanged"]
+
+
+def hypothesis_rows(records):
+    """One row per hypothesis with the columns needed for the comparison."""
+    rows = []
+    for record in records:
+        for hypothesis in topic_hypotheses(record):
+            rows.append({
+                "id": str(record["id"]),
+                "dimension": hypothesis.get("dimension"),
+                "ideological_side": hypothesis.get("ideological_side"),
+                "hypothesis": hypothesis.get("hypothesis"),
+            })
+    return pd.DataFrame(rows, columns=ROW_COLUMNS)
+
+
+def _fingerprint(text: pd.Series):
+    # Whitespace and case changes are not rewrites
+    normalized = text.fillna("").str.lower().str.split().str.join(" ")
+    return pd.util.hash_pandas_object(normalized, index=False).to_numpy()
+
+
+def compare_rows(old: pd.DataFrame, new: pd.DataFrame):
+    """Hash-join two runs' hypothesis rows and flag what changed.
+
+    Only topic ids present in both runs are compared. Returns one row per
+    matched or unmatched hypothesis with a `status` of "added", "removed" or
+    "matched", and `side_flipped` / `rewritten` flags for matched ones.
+    """
+    shared_ids = set(old["id"]).intersection(new["id"])
+    old = old[old["id"].isin(shared_ids)].copy()
+    new = new[new["id"].isin(shared_ids)].copy()
+
+    # Topics can have several hypotheses for one dimension, match them in order
+    for df in (old, new):
+        df["n"] = df.groupby(["id", "dimension"]).cumcount()
+        df["fingerprint"] = _fingerprint(df["hypothesis"])
+
+    diff = old.merge(new, on=["id", "dimension", "n"], how="outer", suffixes=("_old", "_new"), indicator=True)
+    diff["status"] = diff["_merge"].map({"left_only": "removed", "right_only": "added", "both": "matched"}).astype(str)
+    matched = diff["status"] == "matched"
+    diff["side_flipped"] = matched & (
+        diff["ideological_side_old"].fillna("") != diff["ideological_side_new"].fillna("")
+    )
+    diff["rewritten"] = matched & (diff["fingerprint_old"] != diff["fingerprint_new"])
+    return diff.drop(columns=["_merge", "n", "fingerprint_old", "fingerprint_new"])
+
+
+def diff_stats(diff: pd.DataFrame):
+    """Aggregate change counts per dimension."""
+    unchanged = (diff["status"] == "matched") & ~diff["side_flipped"] & ~diff["rewritten"]
+    flags = pd.DataFrame({
+        "dimension": diff["dimension"],
+        "added": diff["status"] == "added",
+        "removed": diff["status"] == "removed",
+        "side_flipped": diff["side_flipped"],
+        "rewritten": diff["rewritten"],
+        "unchanged": unchanged,
+    })
+    return _in_dimension_order(flags.groupby("dimension").sum().astype(int))
+
+
+def _in_dimension_order(stats: pd.DataFrame):
+    dimensions = [d for d in DIMENSIONS_DESCRIPTIONS if d in stats.index]
+    return stats.reindex(dimensions + [d for d in stats.index if d not in dimensions], columns=STAT_COLUMNS)
+
+
+def changed_rows(diff: pd.DataFrame):
+    return diff[(diff["status"] != "matched") | diff["side_flipped"] | diff["rewritten"]]
+
+
+@st.cache_data(show_spinner=False)
+def _compare_runs(path: str, old_run_id: str, new_run_id: str, old_version: str, new_version: str):
+    old = load_jsonl_results(path, old_run_id).to_dict("records")
+    new = load_jsonl_results(path, new_run_id).to_dict("records")
+    diff = compare_rows(hypothesis_rows(old), hypothesis_rows(new))
+    return diff, diff_stats(diff)
+
+
+def compare_runs(path: str, old_run_id: str, new_run_id: str):
+    """Diff of two runs found under `path` and its per-dimension stats, cached per version of the runs."""
+    runs = list_runs(path)
+    return _compare_runs(
+        path, old_run_id, new_run_id, dataset_version(runs[old_run_id]), dataset_version(runs[new_run_id])
+    )
+
+
+def _partition(file_paths: list, directory: Path, partitions: int):
+    """Stream a run's hypothesis rows into `partitions` files, bucketed by id."""
+    outputs = [open(directory / f"{i:04d}.jsonl", "w") for i in range(partitions)]
+    try:
+        for file_path in file_paths:
+            with open(file_path, "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    topic_id = str(record["id"])
+                    bucket = outputs[zlib.crc32(topic_id.encode()) % partitions]
+                    for hypothesis in topic_hypotheses(record):
+                        bucket.write(json.dumps([
+                            topic_id,
+                            hypothesis.get("dimension"),
+                            hypothesis.get("ideological_side"),
+                            hypothesis.get("hypothesis"),
+                        ]) + "\n")
+    finally:
+        for output in outputs:
+            output.close()
+
+
+def _read_partition(path: Path):
+    with open(path, "r") as f:
+        return pd.DataFrame([json.loads(line) for line in f], columns=ROW_COLUMNS)
+
+
+def diff_runs(old_path: str, new_path: str, output: str = None, partitions: int = 64):
+    """Compare two runs without loading either of them whole.
+
+    Args:
+        old_path: File, directory or glob pattern of the old run.
+        new_path: File, directory or glob pattern of the new run.
+        output: Optional JSONL file to write the changed hypotheses to.
+        partitions: Number of id buckets. Each bucket is loaded on its own, so memory
+            use is roughly the size of the runs divided by this number.
+    """
+    stats = []
+    with tempfile.TemporaryDirectory() as tmp:
+        old_dir, new_dir = Path(tmp, "old"), Path(tmp, "new")
+        old_dir.mkdir()
+        new_dir.mkdir()
+        _partition(dataset_files(old_path), old_dir, partitions)
+        _partition(dataset_files(new_path), new_dir, partitions)
+
+        changes = open(output, "w") if output else None
+        try:
+            for i in range(partitions):
+                name = f"{i:04d}.jsonl"
+                diff = compare_rows(_read_partition(old_dir / name), _read_partition(new_dir / name))
+                stats.append(diff_stats(diff))
+                if changes:
+                    changed_rows(diff).to_json(changes, orient="records", lines=True)
+        finally:
+            if changes:
+                changes.close()
+
+    stats = _in_dimension_order(pd.concat(stats).groupby(level=0).sum())
+    print(stats.to_string())
+    return stats
+
+
+if __name__ == "__main__":
+    from jsonargparse import CLI
+
+    CLI(diff_runs)
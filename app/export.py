@@ -0,0 +1,220 @@
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime, timezone
+
+import streamlit as st
+
+from app.utils import DIMENSIONS_DESCRIPTIONS
+
+EXPORT_FORMATS = {
+    "JSONL": {"extension": "jsonl", "mime": "application/json"},
+    "CSV": {"extension": "csv", "mime": "text/csv"},
+    "Parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+# Column types of each export. Nested fields are flattened with a dot
+# (e.g. "labels.clarity"), the same naming pd.json_normalize uses.
+SCHEMAS = {
+    "labeled_hypotheses": {
+        "topic_id": "string",
+        "topic": "string",
+        "top_term": "string",
+        "hypothesis": "string",
+        "dimension": "string",
+        "labels.clarity": "string",
+        "labels.relevance": "string",
+    },
+    "topic_dimensions": {
+        "topic_id": "string",
+        **{dimension: "boolean" for dimension in DIMENSIONS_DESCRIPTIONS},
+    },
+    "metrics": {
+        "precision": "double",
+        "recall": "double",
+        "f1": "double",
+    },
+}
+
+METADATA_KEY = "hypothesis_labeler"
+
+
+def topic_dimensions_records(labeled_topics: dict):
+    """Turn {topic_id: [dimensions]} into one row per topic with a flag per dimension."""
+    for topic_id, dimensions in labeled_topics.items():
+        record = {"topic_id": str(topic_id)}
+        for dimension in DIMENSIONS_DESCRIPTIONS:
+            record[dimension] = dimension in dimensions
+        yield record
+
+
+def _clean(value):
+    # Missing values come out of pandas as NaN, write them as null instead
+    if isinstance(value, dict):
+        return {key: _clean(item) for key, item in value.items()}
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+def _flatten(record: dict, prefix: str = ""):
+    flat = {}
+    for key, value in record.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = _clean(value)
+    return flat
+
+
+def _chunked(records, chunk_size: int):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def build_metadata(kind: str, file_format: str, provenance: dict = None):
+    """Schema and provenance stored alongside every export."""
+    return {
+        "export": kind,
+        "format": file_format,
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "schema": SCHEMAS[kind],
+        "provenance": provenance or {},
+    }
+
+
+def iter_jsonl_chunks(records, metadata: dict, chunk_size: int = 1000):
+    """Yield JSONL bytes chunk by chunk, with the same flat columns as the schema.
+
+    The first line holds the metadata under "_meta".
+    """
+    yield (json.dumps({"_meta": metadata}) + "\n").encode()
+    for chunk in _chunked(records, chunk_size):
+        yield "".join(json.dumps(_flatten(record)) + "\n" for record in chunk).encode()
+
+
+def iter_csv_chunks(records, metadata: dict, chunk_size: int = 1000):
+    """Yield CSV bytes chunk by chunk, preceded by a "#" comment line holding the metadata."""
+    columns = list(metadata["schema"])
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+
+    buffer.write(f"# {METADATA_KEY}: {json.dumps(metadata)}\n")
+    writer.writeheader()
+    for chunk in _chunked(records, chunk_size):
+        writer.writerows(_flatten(record) for record in chunk)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def write_parquet(records, metadata: dict, path: str, chunk_size: int = 1000):
+    """Write records to Parquet one row group per chunk, metadata in the schema."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {"string": pa.string(), "boolean": pa.bool_(), "double": pa.float64()}
+    schema = pa.schema(
+        [(column, types[column_type]) for column, column_type in metadata["schema"].items()],
+        metadata={METADATA_KEY: json.dumps(metadata)},
+    )
+
+    with pq.ParquetWriter(path, schema) as writer:
+        written = False
+        for chunk in _chunked(records, chunk_size):
+            flat = [_flatten(record) for record in chunk]
+            writer.write_batch(pa.RecordBatch.from_pylist(flat, schema=schema))
+            written = True
+        if not written:
+            writer.write_table(schema.empty_table())
+
+
+def write_export(records, kind: str, file_format: str, path: str, provenance: dict = None):
+    """Write an export to `path` without building it in memory. Returns the metadata."""
+    metadata = build_metadata(kind, file_format, provenance)
+
+    if file_format == "Parquet":
+        write_parquet(records, metadata, path)
+        return metadata
+
+    chunks = iter_jsonl_chunks(records, metadata) if file_format == "JSONL" else iter_csv_chunks(records, metadata)
+    with open(path, "wb") as f:
+        for chunk in chunks:
+            f.write(chunk)
+    return metadata
+
+
+def export_bytes(records, kind: str, file_format: str, provenance: dict = None):
+    """Write an export through a temporary file and return its contents."""
+    fd, path = tempfile.mkstemp(suffix=f".{EXPORT_FORMATS[file_format]['extension']}")
+    os.close(fd)
+    try:
+        write_export(records, kind, file_format, path, provenance)
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.unlink(path)
+
+
+def read_export(path: str):
+    """Read an export back into a DataFrame. Returns (dataframe, metadata)."""
+    import pandas as pd
+
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        table = pq.read_table(path)
+        metadata = json.loads(table.schema.metadata[METADATA_KEY.encode()])
+        return table.to_pandas(), metadata
+
+    with open(path, "r") as f:
+        first_line = f.readline()
+        if path.endswith(".csv"):
+            metadata = json.loads(first_line.split(":", 1)[1])
+            return pd.read_csv(f, dtype={"topic_id": str}), metadata
+
+        metadata = json.loads(first_line)["_meta"]
+        return pd.read_json(f, lines=True, dtype={"topic_id": str}), metadata
+
+
+def export_format_selector():
+    return st.sidebar.selectbox("Export format", list(EXPORT_FORMATS), key="export_format")
+
+
+def export_download_button(
+    label: str,
+    records,
+    kind: str,
+    file_name: str,
+    file_format: str,
+    provenance: dict = None,
+    **kwargs,
+):
+    """st.download_button whose export is only written when the button is clicked.
+
+    `records` is an iterable of records or a callable returning one. The export
+    is generated on another thread after the rerun that drew the button, so pass
+    records that later reruns do not modify.
+    """
+    file_info = EXPORT_FORMATS[file_format]
+
+    def generate():
+        return export_bytes(records() if callable(records) else records, kind, file_format, provenance)
+
+    return st.download_button(
+        label=label,
+        data=generate,
+        file_name=f"{file_name}.{file_info['extension']}",
+        mime=file_info["mime"],
+        **kwargs,
+    )
@@ -0,0 +1,266 @@
+"""Concurrent-session load test of the app pages.
+
+Each simulated annotator drives a page through Streamlit's ``AppTest``, clicking
+radios, checkboxes, selectboxes and Next/Previous with random think times, and
+every rerun is timed. ``AppTest`` swaps Streamlit's global runtime in and out on
+each run, so sessions cannot share a process; instead each one runs in its own
+process and all of them are pinned to the same CPUs, which emulates a single
+server process serving N sessions. Run from the project root::
+
+    python -m app.loadtest --pages [topics_labeler] --sessions [1,5,10,20] \\
+        --hypotheses_path "app/hypotheses_*.jsonl"
+"""
+import json
+import math
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+project_root = Path().absolute()
+sys.path.append(str(project_root))
+
+# AppTest runs the script on its own thread, so its thread CPU time is the
+# server's share, without the test client's own work
+PAGE_SCRIPT = """
+import runpy
+import time
+
+from app.loadtest import SCRIPT_CPU
+
+page = runpy.run_path({path!r}, run_name="__loadtest__")
+started = time.thread_time()
+try:
+    page["main"](**{kwargs!r})
+finally:
+    SCRIPT_CPU.append(time.thread_time() - started)
+"""
+
+# CPU seconds of each page script run in this process
+SCRIPT_CPU = []
+
+
+def _navigate(at, rng: random.Random):
+    buttons = {button.label: button for button in at.button if not button.disabled}
+    label = "⬅️ Previous" if rng.random() < 0.1 else "Next ➡️"
+    button = buttons.get(label) or buttons.get("⬅️ Previous") or buttons.get("Next ➡️")
+    if button:
+        button.click()
+
+
+def _explore_step(at, rng: random.Random):
+    for selectbox in at.selectbox:
+        if selectbox.label == "Select a topic to explore":
+            selectbox.set_value(rng.choice(selectbox.options))
+
+
+def _label_hypothesis_step(at, rng: random.Random):
+    unanswered = [radio for radio in at.radio if radio.value == "Select"]
+    if unanswered:
+        rng.choice(unanswered).set_value(rng.choice(["Yes", "No"]))
+    else:
+        _navigate(at, rng)
+
+
+def _label_topic_step(at, rng: random.Random):
+    if at.checkbox and rng.random() < 0.75:
+        checkbox = rng.choice(at.checkbox)
+        checkbox.set_value(not checkbox.value)
+    else:
+        _navigate(at, rng)
+
+
+# Page name -> (script glob, main() argument holding the hypotheses path, one user interaction)
+PAGES = {
+    "explorer": ("app/💡_*.py", "hypotheses_file", _explore_step),
+    "hypothesis_labeler": ("app/pages/1_*.py", "hypotheses_path", _label_hypothesis_step),
+    "topics_labeler": ("app/pages/2_*.py", "hypotheses_path", _label_topic_step),
+}
+
+
+def _rss():
+    """Resident memory of this process in bytes."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _page_script(page: str, hypotheses_path: str = None, sampled_topics_path: str = None):
+    pattern, path_argument, _ = PAGES[page]
+    kwargs = {}
+    if hypotheses_path:
+        kwargs[path_argument] = hypotheses_path
+    if sampled_topics_path and page == "topics_labeler":
+        kwargs["sampled_topics_path"] = sampled_topics_path
+    path = str(next(project_root.glob(pattern)))
+    return PAGE_SCRIPT.format(path=path, kwargs=kwargs)
+
+
+def _session(page: str, script: str, steps: int, think_time: float, seed: int, cpus: set, start_at: float, timeout: float):
+    """One simulated annotator. Runs in its own process."""
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+    from streamlit.testing.v1 import AppTest
+
+    # The list the page scripts append to, this module may be running as __main__
+    from app.loadtest import SCRIPT_CPU
+
+    # Warm the data caches first, a real server shares them between sessions
+    AppTest.from_string(script, default_timeout=timeout).run()
+    baseline_rss = _rss()
+    SCRIPT_CPU.clear()
+
+    rng = random.Random(seed)
+    step = PAGES[page][2]
+    at = AppTest.from_string(script, default_timeout=timeout)
+    time.sleep(max(0.0, start_at - time.time()))
+
+    started = time.perf_counter()
+    at.run()
+    first_render = time.perf_counter() - started
+
+    latencies = []
+    errors = len(at.exception)
+    for _ in range(steps):
+        if think_time:
+            time.sleep(rng.expovariate(1 / think_time))
+        step(at, rng)
+        started = time.perf_counter()
+        at.run()
+        latencies.append(time.perf_counter() - started)
+        errors += len(at.exception)
+
+    return {
+        "first_render": first_render,
+        "latencies": latencies,
+        "memory": _rss() - baseline_rss,
+        "cpu": sum(SCRIPT_CPU),
+        "errors": errors,
+    }
+
+
+def _percentile(values: list, q: float):
+    values = sorted(values)
+    return values[max(0, math.ceil(q * len(values)) - 1)] if values else float("nan")
+
+
+def run_sessions(
+    page: str,
+    sessions: int,
+    steps: int = 20,
+    think_time: float = 1.0,
+    hypotheses_path: str = None,
+    sampled_topics_path: str = None,
+    cpus: int = 1,
+    timeout: float = 60,
+    seed: int = 42,
+):
+    """Drive `sessions` concurrent sessions through one page and aggregate their timings."""
+    script = _page_script(page, hypotheses_path, sampled_topics_path)
+    cpu_set = set(range(min(cpus, os.cpu_count() or 1)))
+    # Leave time for every worker to start and warm up before the sessions begin together
+    start_at = time.time() + 10 + 0.5 * sessions
+
+    with ProcessPoolExecutor(max_workers=sessions, mp_context=multiprocessing.get_context("spawn")) as executor:
+        futures = [
+            executor.submit(_session, page, script, steps, think_time, seed + i, cpu_set, start_at, timeout)
+            for i in range(sessions)
+        ]
+        results = [future.result() for future in futures]
+    wall = time.time() - start_at
+
+    latencies = [latency for result in results for latency in result["latencies"]]
+    return {
+        "page": page,
+        "sessions": sessions,
+        "reruns": len(latencies),
+        "first_render_p50_ms": 1000 * _percentile([r["first_render"] for r in results], 0.5),
+        "p50_ms": 1000 * _percentile(latencies, 0.50),
+        "p95_ms": 1000 * _percentile(latencies, 0.95),
+        "p99_ms": 1000 * _percentile(latencies, 0.99),
+        "memory_per_session_mb": sum(r["memory"] for r in results) / len(results) / 2**20,
+        "server_cpu": sum(r["cpu"] for r in results) / (wall * len(cpu_set)),
+        "errors": sum(r["errors"] for r in results),
+    }
+
+
+def load_test(
+    pages: list[str] = list(PAGES),
+    sessions: list[int] = [1, 5, 10, 20],
+    steps: int = 20,
+    think_time: float = 1.0,
+    hypotheses_path: str = None,
+    sampled_topics_path: str = None,
+    cpus: int = 1,
+    timeout: float = 60,
+    output: str = None,
+    max_p95_ms: float = None,
+):
+    """Report rerun latency, memory and CPU as the number of concurrent sessions grows.
+
+    Args:
+        pages: Pages to test, any of explorer, hypothesis_labeler and topics_labeler.
+        sessions: Numbers of concurrent sessions to try.
+        steps: Interactions (reruns) per session.
+        think_time: Mean seconds between interactions of one session.
+        hypotheses_path: Hypotheses file, directory or glob, defaults to each page's default.
+        sampled_topics_path: Sampled topics file of the Topics labeler.
+        cpus: CPUs the simulated server may use.
+        timeout: Seconds before a single rerun is considered hung.
+        output: Optional JSON file to write the results to.
+        max_p95_ms: Fail (exit code 1) if any p95 rerun latency exceeds this, or if
+            any rerun raised an error.
+    """
+    header = f"{'page':<20}{'N':>4}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'first ms':>10}{'MB/sess':>9}{'CPU':>7}{'errors':>8}"
+    print(header)
+    results = []
+    for page in pages:
+        for n in sessions:
+            result = run_sessions(page, n, steps, think_time, hypotheses_path, sampled_topics_path, cpus, timeout)
+            results.append(result)
+            print(
+                f"{page:<20}{n:>4}{result['p50_ms']:>9.0f}{result['p95_ms']:>9.0f}{result['p99_ms']:>9.0f}"
+                f"{result['first_render_p50_ms']:>10.0f}{result['memory_per_session_mb']:>9.1f}"
+                f"{result['server_cpu']:>7.0%}{result['errors']:>8}"
+            )
+
+    print(
+        "\nMB/sess: RSS growth of the process running one session, after the shared caches are warm."
+        "\n  Each session has its own process, so this leaves out memory a real server shares between"
+        "\n  sessions, and allocator noise can make it slightly negative."
+        "\nCPU: CPU time of the page scripts (the server's share, not the test client's), over wall time"
+        "\n  and the CPUs allowed."
+    )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if max_p95_ms is not None:
+        slow = [r for r in results if r["p95_ms"] > max_p95_ms]
+        failed = [r for r in results if r["errors"]]
+        problems = []
+        if slow:
+            problems.append("p95 rerun latency above {:.0f} ms: {}".format(
+                max_p95_ms, ", ".join(f"{r['page']} with {r['sessions']} sessions" for r in slow)
+            ))
+        if failed:
+            problems.append("errors: {}".format(
+                ", ".join(f"{r['page']} with {r['sessions']} sessions ({r['errors']})" for r in failed)
+            ))
+        if problems:
+            raise SystemExit("\n".join(problems))
+    return results
+
+
+if __name__ == "__main__":
+    from jsonargparse import CLI
+
+    CLI(load_test)
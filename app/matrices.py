@@ -0,0 +1,299 @@
+"""Bit-packed, memory-mapped topic x dimension matrices for corpus-scale evaluation.
+
+A matrix is a directory holding:
+
+- ``bits.npy``: uint8 array of shape (topics, 3), one bit per dimension in
+  DIMENSIONS_DESCRIPTIONS order (np.packbits layout),
+- ``ids.npy``: the topic id of each row, as fixed-width UTF-8 bytes,
+- ``index_rows.npy``: row numbers in id order, the id -> row index
+  (``ids[index_rows]`` is sorted),
+- ``meta.json``: format, kind, source and dimensions.
+
+All arrays are opened with ``mmap_mode="r"``, so opening is instant and only
+the pages a comparison touches are read. Build and compare from the project
+root::
+
+    python -m app.matrices build_ground_truth "runs/run_a/*.jsonl" matrices/run_a
+    python -m app.matrices build_selections topics_ideological_dimensions.jsonl matrices/annotator_1
+    python -m app.matrices compare matrices/run_a matrices/annotator_1
+"""
+import json
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+project_root = Path().absolute()
+sys.path.append(str(project_root))
+
+from app.utils import (
+    DIMENSIONS_DESCRIPTIONS,
+    dataset_files,
+    metrics_from_counters,
+    per_dimension_metrics,
+    topic_hypotheses,
+)
+
+DIMENSIONS = list(DIMENSIONS_DESCRIPTIONS)
+CHUNK_ROWS = 1_000_000
+MATRIX_FORMAT = 2
+
+
+def pack_rows(rows):
+    """Pack boolean (topics, dimensions) rows into (topics, 3) uint8."""
+    return np.packbits(np.asarray(rows, dtype=bool).reshape(-1, len(DIMENSIONS)), axis=1)
+
+
+def unpack_rows(bits):
+    return np.unpackbits(bits, axis=1, count=len(DIMENSIONS)).astype(bool)
+
+
+def encode_ids(ids):
+    """Topic ids as a fixed-width bytes array."""
+    return np.array([str(topic_id).encode() for topic_id in ids], dtype="S")
+
+
+def _write_index(path: Path, ids, kind: str, source: str):
+    """Write the id -> row index of `ids`, a bytes array that may be memory-mapped, and meta.json."""
+    order = np.argsort(ids, kind="stable")
+    # Duplicates are adjacent once sorted, check them a chunk at a time
+    for start in range(0, max(len(order) - 1, 0), CHUNK_ROWS):
+        sorted_ids = np.asarray(ids[order[start:start + CHUNK_ROWS + 1]])
+        if (sorted_ids[1:] == sorted_ids[:-1]).any():
+            raise ValueError(f"Duplicate topic ids in {source}")
+
+    np.save(path / "index_rows.npy", order.astype(np.uint32 if len(ids) < 2**32 else np.int64))
+    with open(path / "meta.json", "w") as f:
+        json.dump(
+            {"format": MATRIX_FORMAT, "kind": kind, "source": source, "rows": len(ids), "dimensions": DIMENSIONS},
+            f,
+            indent=2,
+        )
+
+
+@contextmanager
+def _building(output: str):
+    """Directory to build a matrix in, moved to `output` only once it is complete.
+
+    A failed or interrupted build leaves any existing matrix at `output` as it was.
+    """
+    output = Path(output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    building = Path(tempfile.mkdtemp(dir=output.parent, prefix=f".{output.name}."))
+    try:
+        yield building
+        if output.exists():
+            previous = Path(tempfile.mkdtemp(dir=output.parent, prefix=f".{output.name}.old."))
+            os.replace(output, previous / output.name)
+            os.replace(building, output)
+            shutil.rmtree(previous)
+        else:
+            os.replace(building, output)
+    finally:
+        shutil.rmtree(building, ignore_errors=True)
+
+
+def write_matrix(path: str, ids: list, bits, kind: str, source: str):
+    """Write packed rows and their ids as a matrix directory."""
+    ids = encode_ids(ids)
+    with _building(path) as building:
+        np.save(building / "bits.npy", np.asarray(bits, dtype=np.uint8))
+        np.save(building / "ids.npy", ids)
+        _write_index(building, ids, kind, source)
+
+
+def open_matrix(path: str):
+    """Open a matrix directory without reading its arrays into memory."""
+    path = Path(path)
+    with open(path / "meta.json", "r") as f:
+        meta = json.load(f)
+    if meta.get("format") != MATRIX_FORMAT:
+        raise ValueError(f"{path} was built by an older version, build it again")
+    if meta["dimensions"] != DIMENSIONS:
+        raise ValueError(f"{path} was built for different dimensions")
+
+    matrix = {
+        "bits": np.load(path / "bits.npy", mmap_mode="r"),
+        "ids": np.load(path / "ids.npy", mmap_mode="r"),
+        "index_rows": np.load(path / "index_rows.npy", mmap_mode="r"),
+        "meta": meta,
+    }
+    if not meta["rows"] == len(matrix["bits"]) == len(matrix["ids"]) == len(matrix["index_rows"]):
+        raise ValueError(f"{path} is incomplete, its arrays do not all have {meta['rows']} rows; build it again")
+    return matrix
+
+
+def build_ground_truth(hypotheses_path: str, output: str):
+    """Build the ground truth matrix of a run: the dimensions each topic has hypotheses for.
+
+    Args:
+        hypotheses_path: File, directory or glob pattern of the run's JSONL shards.
+        output: Matrix directory to write.
+    """
+    files = dataset_files(hypotheses_path)
+    n_rows = 0
+    for file_path in files:
+        with open(file_path, "r") as f:
+            n_rows += sum(1 for line in f if line.strip())
+
+    # Rows are packed chunk by chunk into a memory-mapped file. Ids are spooled to a
+    # temporary file until their width is known, then copied into their own mapped file.
+    with _building(output) as path, tempfile.TemporaryFile() as id_file:
+        bits = np.lib.format.open_memmap(path / "bits.npy", mode="w+", dtype=np.uint8, shape=(n_rows, 3))
+        column = {dimension: i for i, dimension in enumerate(DIMENSIONS)}
+        chunk = np.zeros((min(CHUNK_ROWS, n_rows), len(DIMENSIONS)), dtype=bool)
+        width = 1
+        rows = start = 0
+        for file_path in files:
+            with open(file_path, "r") as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json.loads(line)
+                    for hypothesis in topic_hypotheses(record):
+                        if hypothesis.get("dimension") in column:
+                            chunk[rows - start, column[hypothesis["dimension"]]] = True
+                    topic_id = str(record["id"]).encode()
+                    width = max(width, len(topic_id))
+                    id_file.write(topic_id + b"\n")
+                    rows += 1
+
+                    if rows - start == len(chunk):
+                        bits[start:rows] = pack_rows(chunk)
+                        chunk[:] = False
+                        start = rows
+        bits[start:rows] = pack_rows(chunk[:rows - start])
+        bits.flush()
+        del bits
+
+        ids = np.lib.format.open_memmap(path / "ids.npy", mode="w+", dtype=f"S{width}", shape=(rows,))
+        id_file.seek(0)
+        for start in range(0, rows, CHUNK_ROWS):
+            end = min(start + CHUNK_ROWS, rows)
+            ids[start:end] = [id_file.readline().rstrip(b"\n") for _ in range(end - start)]
+        ids.flush()
+
+        _write_index(path, ids, "ground_truth", hypotheses_path)
+        del ids
+
+
+def _read_selections(labels_path: str):
+    """{topic_id: [dimensions]} from a legacy JSON dict or a topic_dimensions export."""
+    if labels_path.endswith(".json"):
+        with open(labels_path, "r") as f:
+            return json.load(f)
+
+    from app.export import read_export
+
+    df, _ = read_export(labels_path)
+    flags = df[DIMENSIONS].astype(bool).to_numpy()
+    return {
+        str(topic_id): [dimension for dimension, selected in zip(DIMENSIONS, row) if selected]
+        for topic_id, row in zip(df["topic_id"], flags)
+    }
+
+
+def build_selections(labels_path: str, output: str):
+    """Build the matrix of an annotator's selected dimensions.
+
+    Args:
+        labels_path: Saved labeled topics, as JSON ({topic_id: [dimensions]}) or a
+            JSONL/CSV/Parquet topic dimensions export.
+        output: Matrix directory to write.
+    """
+    selections = _read_selections(labels_path)
+    rows = [[dimension in dimensions for dimension in DIMENSIONS] for dimensions in selections.values()]
+    write_matrix(output, list(selections), pack_rows(rows), "selections", labels_path)
+
+
+def _lookup(matrix: dict, ids):
+    """Rows of `ids` in `matrix`, -1 where the id is missing."""
+    index_rows = matrix["index_rows"]
+    n = len(index_rows)
+    if n == 0:
+        return np.full(len(ids), -1)
+
+    # Binary search of all ids at once through the mapped index, which only reads
+    # the pages it visits. Sorted queries visit them in order.
+    order = np.argsort(ids, kind="stable")
+    queries = ids[order]
+    low = np.zeros(len(queries), dtype=np.int64)
+    high = np.full(len(queries), n, dtype=np.int64)
+    for _ in range(n.bit_length()):
+        searching = low < high
+        middle = (low + high) // 2
+        below = matrix["ids"][index_rows[np.minimum(middle, n - 1)]] < queries
+        low = np.where(searching & below, middle + 1, low)
+        high = np.where(searching & ~below, middle, high)
+
+    rows = np.asarray(index_rows[np.minimum(low, n - 1)], dtype=np.int64)
+    found = matrix["ids"][rows] == queries
+    result = np.empty(len(ids), dtype=np.int64)
+    result[order] = np.where(found, rows, -1)
+    return result
+
+
+def compare_matrices(reference: dict, other: dict, chunk_rows: int = CHUNK_ROWS):
+    """Per-dimension tp/fp/fn counts of `other` against `reference` on their shared ids.
+
+    Topics missing from the reference are skipped, as in calculate_metrics.
+    Returns the counters and the number of compared and exactly matching rows.
+    """
+    counters = {key: np.zeros(len(DIMENSIONS), dtype=np.int64) for key in ("tp", "fp", "fn")}
+    compared = exact = 0
+    same_rows = len(reference["ids"]) == len(other["ids"]) and np.array_equal(reference["ids"], other["ids"])
+
+    for start in range(0, len(other["ids"]), chunk_rows):
+        end = min(start + chunk_rows, len(other["ids"]))
+        other_bits = np.asarray(other["bits"][start:end])
+        if same_rows:
+            reference_bits = np.asarray(reference["bits"][start:end])
+        else:
+            rows = _lookup(reference, np.asarray(other["ids"][start:end]))
+            found = rows >= 0
+            other_bits = other_bits[found]
+            reference_bits = np.asarray(reference["bits"][rows[found]])
+
+        truth = unpack_rows(reference_bits)
+        pred = unpack_rows(other_bits)
+        counters["tp"] += (truth & pred).sum(axis=0)
+        counters["fp"] += (~truth & pred).sum(axis=0)
+        counters["fn"] += (truth & ~pred).sum(axis=0)
+        compared += len(other_bits)
+        exact += int((reference_bits == other_bits).all(axis=1).sum())
+
+    counters = {key: [int(count) for count in values] for key, values in counters.items()}
+    return counters, compared, exact
+
+
+def compare(reference: str, other: str, per_dimension: bool = True):
+    """Precision, recall and F1 of one matrix against another, e.g. an annotator
+    against a run's ground truth, two annotators, or two runs.
+
+    Args:
+        reference: Matrix directory used as ground truth.
+        other: Matrix directory compared to it.
+        per_dimension: Also print the metrics of each dimension.
+    """
+    counters, compared, exact = compare_matrices(open_matrix(reference), open_matrix(other))
+    metrics = metrics_from_counters(counters)
+    print(f"Topics compared: {compared}, identical: {exact}")
+    print(f"Precision {metrics['precision']:.4f}  Recall {metrics['recall']:.4f}  F1 {metrics['f1']:.4f}")
+
+    if per_dimension:
+        for dimension, values in per_dimension_metrics(counters).items():
+            print(
+                f"  {dimension:<24} P {values['precision']:.4f}  R {values['recall']:.4f}  F1 {values['f1']:.4f}"
+                f"  (tp {values['tp']}, fp {values['fp']}, fn {values['fn']})"
+            )
+    return {**metrics, "compared": compared, "identical": exact}
+
+
+if __name__ == "__main__":
+    from jsonargparse import CLI
+
+    CLI([build_ground_truth, build_selections, compare])
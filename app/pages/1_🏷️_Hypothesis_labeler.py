@@ -1,4 +1,3 @@
-import json
 import sys
 from pathlib import Path
 
@@ -8,15 +7,10 @@ import streamlit as st
 project_root = Path().absolute()
 sys.path.append(str(project_root))
 
-
-@st.cache_data(show_spinner=False)
-def load_jsonl_results(file_path):
-    """Load results from JSONL file."""
-    results = []
-    with open(file_path, "r") as f:
-        for line in f:
-            results.append(json.loads(line))
-    return pd.DataFrame(results)
+from app.export import export_download_button, export_format_selector
+from app.render import hypothesis_card, inject_styles, topic_info
+from app.summary import load_summary, summarize_records, summary_distributions
+from app.utils import load_jsonl_results, run_selector, run_version
 
 
 def ideological_dimensions_box():
@@ -45,7 +39,7 @@ def ideological_dimensions_box():
         ''')
 
 
-def criteria_box(hypothesis_id: str, dimension: str, current_labels: dict = None):
+def criteria_box(run_id: str, hypothesis_id: str, dimension: str, current_labels: dict = None):
     with st.container(border=True):
         st.write("""
         **Evaluation criteria:** Please assess whether the hypothesis meets the following requirements:
@@ -57,8 +51,8 @@ def criteria_box(hypothesis_id: str, dimension: str, current_labels: dict = None
                 'relevance': None,
             }
 
-        if f"labels_{hypothesis_id}_{dimension}" not in st.session_state:
-            st.session_state[f"labels_{hypothesis_id}_{dimension}"] = current_labels
+        if f"labels_{run_id}_{hypothesis_id}_{dimension}" not in st.session_state:
+            st.session_state[f"labels_{run_id}_{hypothesis_id}_{dimension}"] = current_labels
 
         criteria = {
             'clarity': "Is the hypothesis clearly and coherently stated?",
@@ -72,25 +66,25 @@ def criteria_box(hypothesis_id: str, dimension: str, current_labels: dict = None
                 response = st.radio(
                     f"Response for {criterion}",
                     options=["Select", "Yes", "No"],
-                    key=f"{hypothesis_id}_{dimension}_{criterion}",
+                    key=f"{run_id}_{hypothesis_id}_{dimension}_{criterion}",
                     horizontal=True,
                     label_visibility="collapsed",
                     index=0
                 )
 
                 if response != "Select":
-                    st.session_state[f"labels_{hypothesis_id}_{dimension}"][criterion] = response.lower()
+                    st.session_state[f"labels_{run_id}_{hypothesis_id}_{dimension}"][criterion] = response.lower()
 
         # Update labeled_data in session state only if all criteria have been selected
-        all_selected = all(label is not None for label in st.session_state[f"labels_{hypothesis_id}_{dimension}"].values())
+        all_selected = all(label is not None for label in st.session_state[f"labels_{run_id}_{hypothesis_id}_{dimension}"].values())
         if all_selected:
             topic_id, hypothesis_idx = hypothesis_id.split('__')
-            st.session_state.labeled_data[(topic_id, int(hypothesis_idx))] = st.session_state[f"labels_{hypothesis_id}_{dimension}"]
+            st.session_state.labeled_data[(topic_id, int(hypothesis_idx))] = st.session_state[f"labels_{run_id}_{hypothesis_id}_{dimension}"]
 
         st.markdown("---")
         st.write("**Current labels:**")
         col1, col2 = st.columns(2)
-        for i, (criterion, label) in enumerate(st.session_state[f"labels_{hypothesis_id}_{dimension}"].items()):
+        for i, (criterion, label) in enumerate(st.session_state[f"labels_{run_id}_{hypothesis_id}_{dimension}"].items()):
             with col1 if i == 0 else col2:
                 if label:
                     icon = ":material/check:" if label == "yes" else ":material/close:"
@@ -99,63 +93,26 @@ def criteria_box(hypothesis_id: str, dimension: str, current_labels: dict = None
                     st.warning(f"{criterion.replace('_', ' ').title()}: Not selected yet")
 
 
-def save_labeled_hypotheses(hypotheses: pd.DataFrame):
-    return hypotheses.to_json(orient='records', lines=True)
-
-
-def display_hypothesis(hypothesis):
-    st.markdown(f"""
-    <div style='
-        background-color: #f8f9fa;
-        padding: 20px;
-        border-radius: 10px;
-        margin: 10px 0;
-        border-left: 5px solid #2E9BF5;
-        position: relative;
-    '>
-        <div style='
-            font-size: 24px;
-            color: #2E9BF5;
-            position: absolute;
-            top: 10px;
-            left: 10px;
-        '>❝</div>
-        <div style='
-            padding-left: 25px;
-            padding-top: 10px;
-            font-style: italic;
-            color: #2E9BF5;
-        '>
-            {hypothesis['hypothesis']}
-        </div>
-        <div style='
-            font-size: 24px;
-            color: #2E9BF5;
-            position: absolute;
-            bottom: 0;
-            right: 20px;
-        '>❞</div>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    st.markdown(f"""
-    <div style='
-        background-color: #f8f9fa;
-        padding: 20px;
-        border-radius: 10px;
-        margin: 10px 0;
-        border-left: 5px solid #229954;
-    '>
-        <div style='
-            color: #1a1a1a;
-            font-size: 1em;
-            line-height: 1.6;
-        '>
-            <span style='font-weight: bold;'>Dimension:</span>
-            {hypothesis['dimension']}
-        </div>
-    </div>
-    """, unsafe_allow_html=True)
+def display_hypothesis(hypothesis, version: str):
+    card = hypothesis_card(hypothesis['run_id'], version, hypothesis['id'], hypothesis['hypothesis_idx'], hypothesis)
+    st.markdown(card, unsafe_allow_html=True)
+
+
+def switch_run(run_id: str):
+    """Keep each run's labels and position apart, restoring them when the run is picked again."""
+    if st.session_state.get('labeled_run_id') == run_id:
+        return
+
+    saved = st.session_state.setdefault('hypothesis_labels_by_run', {})
+    if 'labeled_run_id' in st.session_state:
+        saved[st.session_state.labeled_run_id] = {
+            'labeled_data': st.session_state.labeled_data,
+            'current_topic_idx': st.session_state.current_topic_idx,
+        }
+    run_state = saved.pop(run_id, {'labeled_data': {}, 'current_topic_idx': 0})
+    st.session_state.labeled_data = run_state['labeled_data']
+    st.session_state.current_topic_idx = run_state['current_topic_idx']
+    st.session_state.labeled_run_id = run_id
 
 
 def main(
@@ -170,35 +127,39 @@ def main(
     if 'labeled_data' not in st.session_state:
         st.session_state.labeled_data = {}
 
-    hypotheses = load_jsonl_results(hypotheses_path)
+    inject_styles()
+
+    run_id = run_selector(hypotheses_path)
+    switch_run(run_id)
+    hypotheses = load_jsonl_results(hypotheses_path, run_id)
     hypotheses = hypotheses[hypotheses['hypotheses'].apply(lambda x: len(x) > 0)]
 
     hypotheses_exploded = hypotheses.explode('hypotheses')
+    hypotheses_exploded['hypothesis_idx'] = hypotheses_exploded.groupby(level=0).cumcount()
     hypotheses_normalized = pd.json_normalize(hypotheses_exploded['hypotheses'])
     hypotheses = hypotheses_exploded.drop(columns='hypotheses').reset_index(drop=True).join(hypotheses_normalized.reset_index(drop=True))
 
-    total_topics = hypotheses['id'].nunique()
-    total_hypotheses = hypotheses['id'].count()
-
     sampled_hypotheses = hypotheses.sample(n=number_of_hypotheses, random_state=random_seed)
 
+    summary = load_summary(hypotheses_path, run_id)
+    sample_key = (hypotheses_path, run_id, number_of_hypotheses, random_seed)
+    if st.session_state.get('sampled_summary_key') != sample_key:
+        st.session_state.sampled_summary = summarize_records(sampled_hypotheses.to_dict('records'))
+        st.session_state.sampled_summary_key = sample_key
+    sampled_summary = st.session_state.sampled_summary
+
     col1, col2 = st.columns([4, 1])
     with col1:
         st.title("Hypothesis labeler")
     with col2:
-        st.markdown("""
-            <style>
-            .save-button button {
-                height: 35px;
-                font-size: 0.9em;
-                margin-top: 15px;
-            }
-            </style>
-        """, unsafe_allow_html=True)
-        
         labeled_data = []
+        sampled_ids = sampled_hypotheses['id'].astype(str)
         for (topic_id, _), labels in st.session_state.labeled_data.items():
-            topic_row = sampled_hypotheses[sampled_hypotheses['id'] == topic_id].iloc[0]
+            topic_rows = sampled_hypotheses[sampled_ids == topic_id]
+            # Labels of topics no longer in the sample, e.g. after changing the sample size
+            if topic_rows.empty:
+                continue
+            topic_row = topic_rows.iloc[0]
             labeled_data.append({
                 'topic_id': topic_id,
                 'topic': topic_row['topic'],
@@ -208,84 +169,26 @@ def main(
                 'labels': labels
             })
         
-        if labeled_data:
-            json_data = save_labeled_hypotheses(pd.DataFrame(labeled_data))
-            st.download_button(
-                label="💾 Save progress",
-                data=json_data,
-                file_name="labeled_hypotheses.jsonl",
-                mime="application/json",
-                use_container_width=True,
-                key="save_button"
-            )
-        else:
-            st.download_button(
-                label="💾 Save progress",
-                data="",
-                file_name="labeled_hypotheses.jsonl",
-                mime="application/json",
-                use_container_width=True,
-                key="save_button",
-                disabled=True
-            )
+        export_format = export_format_selector()
+        export_download_button(
+            label="💾 Save progress",
+            records=labeled_data,
+            kind="labeled_hypotheses",
+            file_name="labeled_hypotheses",
+            file_format=export_format,
+            provenance={
+                "hypotheses_path": hypotheses_path,
+                "run_id": run_id,
+                "number_of_hypotheses": number_of_hypotheses,
+                "random_seed": random_seed,
+            },
+            use_container_width=True,
+            key="save_button",
+            disabled=not labeled_data
+        )
 
     # Display dataset statistics
     with st.expander("Dataset statistics", expanded=True):
-        st.markdown("""
-            <style>
-            .stats-container {
-                background-color: #f8f9fa;
-                padding: 20px;
-                border-radius: 10px;
-                margin: 10px 0;
-            }
-            .stats-title {
-                color: #2E9BF5;
-                font-weight: bold;
-                margin-bottom: 20px;
-                text-align: center;
-                font-size: 1.2em;
-            }
-            .dataset-box {
-                background-color: white;
-                padding: 15px;
-                border-radius: 8px;
-                margin: 10px;
-                box-shadow: 0 2px 4px rgba(0,0,0,0.05);
-                flex: 1;
-            }
-            .dataset-title {
-                color: #2E9BF5;
-                font-weight: bold;
-                margin-bottom: 10px;
-                border-bottom: 2px solid #f0f0f0;
-                padding-bottom: 8px;
-            }
-            .dataset-stats {
-                display: flex;
-                flex-direction: column;
-                gap: 8px;
-            }
-            .stat-item {
-                display: flex;
-                justify-content: space-between;
-                padding: 5px 0;
-            }
-            .stat-label {
-                color: #666;
-            }
-            .stat-value {
-                font-weight: bold;
-                color: #2E9BF5;
-            }
-            .datasets-grid {
-                display: flex;
-                gap: 20px;
-                justify-content: space-between;
-            }
-            </style>
-        """, unsafe_allow_html=True)
-
         st.markdown("""
             <div class="stats-container">
                 <div class="stats-title">Dataset statistics</div>
@@ -319,32 +222,20 @@ def main(
                 </div>
             </div>
         """.format(
-            total_topics,
-            total_hypotheses,
-            sampled_hypotheses['id'].nunique(),
-            len(sampled_hypotheses)
+            summary['topics_with_hypotheses'],
+            summary['hypotheses'],
+            sampled_summary['topics'],
+            sampled_summary['hypotheses']
         ), unsafe_allow_html=True)
 
-    total_topics = sampled_hypotheses['id'].nunique()
+        summary_distributions(summary)
+
+    total_topics = sampled_summary['topics']
     remaining_topics = total_topics - st.session_state.current_topic_idx
     total_hypotheses = len(sampled_hypotheses)
     
     labeled_hypotheses = len(st.session_state.labeled_data)
 
-    st.markdown("""
-        <style>
-        [data-testid="stMetricValue"] {
-            background-color: #f8f9fa;
-            border-radius: 10px;
-            padding: 10px;
-            box-shadow: 0 2px 4px rgba(0,0,0,0.1);
-            font-size: 1.2em;
-        }
-        [data-testid="stMetricLabel"] {
-            font-size: 0.9em;
-        }
-        </style>
-    """, unsafe_allow_html=True)
     col1, col2 = st.columns(2)
     with col1:
         st.metric("Topics remaining", f"{remaining_topics}/{total_topics}")
@@ -355,56 +246,15 @@ def main(
 
     if st.session_state.current_topic_idx < len(sampled_hypotheses):
         current_topic = sampled_hypotheses.iloc[st.session_state.current_topic_idx]
+
+        st.markdown(topic_info(current_topic["topic"], current_topic["top_term"]), unsafe_allow_html=True)
         
-        st.markdown("""
-            <style>
-            .topic-info {
-                background-color: #f8f9fa;
-                padding: 15px;
-                border-radius: 10px;
-                margin: 10px 0;
-                border-left: 5px solid #9B59B6;
-            }
-            .topic-info h6 {
-                color: #9B59B6;
-                font-weight: bold;
-            }
-            .topic-info p {
-                margin: 0;
-                color: #1a1a1a;
-            }
-            .topic-stats {
-                display: flex;
-                gap: 40px;
-            }
-            </style>
-        """, unsafe_allow_html=True)
-
-        st.markdown(f"""
-            <div class="topic-info">
-                <h6>Topic: {current_topic['topic']}</h6>
-                <div class="topic-stats">
-                    <p><strong>Top term (more general concept for this topic):</strong> {current_topic['top_term']}</p>
-                </div>
-            </div>
-        """, unsafe_allow_html=True)
-        
-        display_hypothesis(current_topic)
+        display_hypothesis(current_topic, run_version(hypotheses_path, run_id))
         
         hypothesis_key = f"{current_topic['id']}__{st.session_state.current_hypothesis_idx}"
         current_labels = st.session_state.labeled_data.get(hypothesis_key)
         
-        criteria_box(hypothesis_key, current_topic['dimension'], current_labels)
-
-        st.markdown("""
-            <style>
-            div.navigation-button button {
-                width: 100%;
-                height: 50px;
-                margin: 10px 0;
-            }
-            </style>
-        """, unsafe_allow_html=True)
+        criteria_box(run_id, hypothesis_key, current_topic['dimension'], current_labels)
 
         col1, _, col3 = st.columns([0.5, 2, 0.5])
         with col1:
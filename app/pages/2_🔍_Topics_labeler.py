@@ -1,5 +1,5 @@
-import json
 import sys
+from functools import partial
 from pathlib import Path
 
 import pandas as pd
@@ -8,16 +8,41 @@ import streamlit as st
 project_root = Path().absolute()
 sys.path.append(str(project_root))
 
-from app.utils import DIMENSIONS_DESCRIPTIONS, calculate_metrics, load_jsonl_results
+from app.export import export_download_button, export_format_selector, topic_dimensions_records
+from app.render import inject_styles, topic_card
+from app.utils import (
+    DIMENSIONS_DESCRIPTIONS,
+    build_metric_counters,
+    ground_truth_dimensions,
+    load_jsonl_results,
+    metrics_from_counters,
+    per_dimension_metrics,
+    run_selector,
+    update_metric_counters,
+)
 
+RUN_LABEL_STATE = ["current_topic_idx", "labeled_topics", "labeled_topic_ids", "metric_counters"]
 
-def initialize_session_state(sampled_topics_path: str, hypotheses_path: str):
-    if "topics_data" not in st.session_state:
+
+def initialize_session_state(sampled_topics_path: str, hypotheses_path: str, run_id: str):
+    if st.session_state.get("topics_run_id") != run_id:
         df_sampled_topics = load_jsonl_results(sampled_topics_path)
         unique_topic_ids = df_sampled_topics['id'].unique()
 
-        df_topics_data = load_jsonl_results(hypotheses_path)
+        df_topics_data = load_jsonl_results(hypotheses_path, run_id)
         st.session_state.topics_data = df_topics_data[df_topics_data['id'].isin(unique_topic_ids)]
+        st.session_state.true_dimensions = ground_truth_dimensions(st.session_state.topics_data.to_dict('records'))
+
+        # Labels are counted against the run's ground truth and exported with its run_id,
+        # keep each run's apart and restore them when the run is picked again
+        saved = st.session_state.setdefault("topic_labels_by_run", {})
+        if "topics_run_id" in st.session_state:
+            saved[st.session_state.topics_run_id] = {
+                key: st.session_state.pop(key) for key in RUN_LABEL_STATE if key in st.session_state
+            }
+        for key, value in saved.pop(run_id, {}).items():
+            st.session_state[key] = value
+        st.session_state.topics_run_id = run_id
 
     if "current_topic_idx" not in st.session_state:
         st.session_state.current_topic_idx = 0
@@ -28,6 +53,11 @@ def initialize_session_state(sampled_topics_path: str, hypotheses_path: str):
     if "labeled_topic_ids" not in st.session_state:
         st.session_state.labeled_topic_ids = set()
 
+    if "metric_counters" not in st.session_state:
+        st.session_state.metric_counters = build_metric_counters(
+            st.session_state.true_dimensions, st.session_state.labeled_topics
+        )
+
 
 def display_ideological_dimensions(current_selections=None):
     """Display checkboxes for all ideological dimensions."""
@@ -42,7 +72,7 @@ def display_ideological_dimensions(current_selections=None):
             with cols[col_idx]:
                 label = f"**{dimension}**: {DIMENSIONS_DESCRIPTIONS[dimension]}"
                 # Use a unique key for each topic's dimension
-                key = f"dim_{st.session_state.current_topic_idx}_{dimension}"
+                key = f"dim_{st.session_state.topics_run_id}_{st.session_state.current_topic_idx}_{dimension}"
 
                 # Set initial value based on current selections
                 initial_value = dimension in current_selections if current_selections else False
@@ -57,24 +87,49 @@ def display_ideological_dimensions(current_selections=None):
         
         return selected_dimensions
 
+
+def display_live_metrics():
+    """Agreement with the LLM dimensions so far, from the running counters."""
+    metrics = metrics_from_counters(st.session_state.metric_counters)
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Precision", f"{metrics['precision']:.2f}")
+    with col2:
+        st.metric("Recall", f"{metrics['recall']:.2f}")
+    with col3:
+        st.metric("F1 Score", f"{metrics['f1']:.2f}")
+
+    with st.expander("Per-dimension agreement"):
+        st.dataframe(
+            pd.DataFrame(per_dimension_metrics(st.session_state.metric_counters)).T,
+            use_container_width=True,
+        )
+
+
 def main(
     sampled_topics_path: str = "app/sampled_hypotheses_42.jsonl",
     hypotheses_path: str = "app/hypotheses_09_04_2025_10_38_54.jsonl",
     output_path: str = 'topics_ideological_dimensions',
     output_path_metrics: str = 'topics_ideological_dimensions_metrics',
 ):
-    initialize_session_state(sampled_topics_path, hypotheses_path)
+    run_id = run_selector(hypotheses_path)
+    initialize_session_state(sampled_topics_path, hypotheses_path, run_id)
+    inject_styles()
+    export_format = export_format_selector()
+    provenance = {"sampled_topics_path": sampled_topics_path, "hypotheses_path": hypotheses_path, "run_id": run_id}
 
     col1, col2 = st.columns([3, 1])
     with col1:
         st.title("🔍 Topics labeler")
     with col2:
         if st.session_state.labeled_topics and st.session_state.current_topic_idx < len(st.session_state.topics_data):
-            st.download_button(
+            export_download_button(
                 label="💾 Save labeled topics",
-                data=json.dumps(st.session_state.labeled_topics),
-                file_name=f"{output_path}.json",
-                mime="application/json",
+                records=partial(topic_dimensions_records, dict(st.session_state.labeled_topics)),
+                kind="topic_dimensions",
+                file_name=output_path,
+                file_format=export_format,
+                provenance=provenance,
                 use_container_width=True
             )
     
@@ -92,55 +147,33 @@ def main(
         st.metric("Progress", f"{progress:.1%}")
     
     st.progress(progress)
+    # Filled at the end of the run so it includes this run's selection changes
+    live_metrics = st.container()
     
     # Display current topic
     if st.session_state.current_topic_idx < len(st.session_state.topics_data):
         current_topic = st.session_state.topics_data.iloc[st.session_state.current_topic_idx]
         topic_id = current_topic["id"]
         
-        top_term_html = ""
-        if current_topic.get("top_term") and pd.notna(current_topic["top_term"]):
-            top_term_html = (
-                "<br><span style='font-weight: bold;'>"
-                f"Top term:</span> {current_topic['top_term']}"
-            )
-
-        st.markdown(
-            f"""
-            <div style='
-                background-color: #f8f9fa;
-                padding: 20px;
-                border-radius: 10px;
-                margin: 10px 0;
-                border-left: 5px solid #2E9BF5;
-            '>
-                <div style='
-                    color: #1a1a1a;
-                    font-size: 1em;
-                    line-height: 1.6;
-                '>
-                    <span style='font-weight: bold; color: #2E9BF5;'>Topic: {current_topic['topic']} (ID: {topic_id})</span> 
-                    {top_term_html}
-                </div>
-            </div>
-            """,
-            unsafe_allow_html=True
-        )
+        top_term = current_topic.get("top_term")
+        if not top_term or pd.isna(top_term):
+            top_term = None
+        st.markdown(topic_card(current_topic["topic"], topic_id, top_term), unsafe_allow_html=True)
 
         current_selections = st.session_state.labeled_topics.get(topic_id, [])
         selected_dimensions = display_ideological_dimensions(current_selections)
         
         if selected_dimensions != current_selections:
+            update_metric_counters(
+                st.session_state.metric_counters,
+                st.session_state.true_dimensions,
+                topic_id,
+                st.session_state.labeled_topics.get(topic_id),
+                selected_dimensions,
+            )
             st.session_state.labeled_topics[topic_id] = selected_dimensions
         
-        st.markdown("""
-            <style>
-            .navigation-buttons {
-                margin-top: 1rem;
-            }
-            </style>
-            <div class="navigation-buttons">
-        """, unsafe_allow_html=True)
+        st.markdown('<div class="navigation-buttons">', unsafe_allow_html=True)
         
         col1, col2, col3 = st.columns([1, 2, 1])
         with col1:
@@ -160,9 +193,11 @@ def main(
                 st.rerun()
         
         st.markdown("</div>", unsafe_allow_html=True)
+
+        with live_metrics:
+            display_live_metrics()
     else:
-        topics_list = st.session_state.topics_data.to_dict('records')
-        metrics = calculate_metrics(topics_list, st.session_state.labeled_topics)
+        metrics = metrics_from_counters(st.session_state.metric_counters)
         
         st.success("🎉 All topics have been reviewed!")
         
@@ -170,19 +205,23 @@ def main(
         with col1:
             st.write("Please save the labeled data (contains topics and the selected dimensions) and metrics.")
         with col2:
-            st.download_button(
+            export_download_button(
                 label="💾 Save labeled topics",
-                data=json.dumps(st.session_state.labeled_topics),
-                file_name=f"{output_path}.json",
-                mime="application/json",
+                records=partial(topic_dimensions_records, dict(st.session_state.labeled_topics)),
+                kind="topic_dimensions",
+                file_name=output_path,
+                file_format=export_format,
+                provenance=provenance,
                 use_container_width=True
             )
         with col3:
-            st.download_button(
+            export_download_button(
                 label="📊 Save metrics",
-                data=json.dumps(metrics),
-                file_name=f"{output_path_metrics}.json",
-                mime="application/json",
+                records=[metrics],
+                kind="metrics",
+                file_name=output_path_metrics,
+                file_format=export_format,
+                provenance=provenance,
                 use_container_width=True
             )
         
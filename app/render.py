@@ -0,0 +1,118 @@
+"""Shared stylesheet and cached HTML cards for hypotheses and topics."""
+import html
+import threading
+from collections import OrderedDict
+
+import streamlit as st
+
+CARD_CACHE_SIZE = 4096
+
+STYLESHEET = """<style>
+.hl-card{background-color:#f8f9fa;padding:20px;border-radius:10px;margin:10px 0;position:relative}
+.hl-quote{border-left:5px solid #2E9BF5}
+.hl-quote .hl-mark{font-size:24px;color:#2E9BF5;position:absolute}
+.hl-quote .hl-open{top:10px;left:10px}
+.hl-quote .hl-close{bottom:0;right:20px}
+.hl-quote .hl-text{padding-left:25px;padding-top:10px;font-style:italic;color:#2E9BF5}
+.hl-quote.hl-numbered .hl-text{font-size:1.1em}
+.hl-details{border-left:5px solid #229954;color:#1a1a1a;font-size:1em;line-height:1.6}
+.hl-topic{border-left:5px solid #2E9BF5;color:#1a1a1a;font-size:1em;line-height:1.6}
+.hl-topic .hl-topic-title{font-weight:bold;color:#2E9BF5}
+.hl-badge{background-color:#2E9BF5;color:white;padding:2px 8px;border-radius:10px;font-size:0.8em}
+.save-button button{height:35px;font-size:0.9em;margin-top:15px}
+.stats-container{background-color:#f8f9fa;padding:20px;border-radius:10px;margin:10px 0}
+.stats-title{color:#2E9BF5;font-weight:bold;margin-bottom:20px;text-align:center;font-size:1.2em}
+.dataset-box{background-color:white;padding:15px;border-radius:8px;margin:10px;box-shadow:0 2px 4px rgba(0,0,0,0.05);flex:1}
+.dataset-title{color:#2E9BF5;font-weight:bold;margin-bottom:10px;border-bottom:2px solid #f0f0f0;padding-bottom:8px}
+.dataset-stats{display:flex;flex-direction:column;gap:8px}
+.stat-item{display:flex;justify-content:space-between;padding:5px 0}
+.stat-label{color:#666}
+.stat-value{font-weight:bold;color:#2E9BF5}
+.datasets-grid{display:flex;gap:20px;justify-content:space-between}
+[data-testid="stMetricValue"]{background-color:#f8f9fa;border-radius:10px;padding:10px;box-shadow:0 2px 4px rgba(0,0,0,0.1);font-size:1.2em}
+[data-testid="stMetricLabel"]{font-size:0.9em}
+.topic-info{background-color:#f8f9fa;padding:15px;border-radius:10px;margin:10px 0;border-left:5px solid #9B59B6}
+.topic-info h6{color:#9B59B6;font-weight:bold}
+.topic-info p{margin:0;color:#1a1a1a}
+.topic-stats{display:flex;gap:40px}
+div.navigation-button button{width:100%;height:50px;margin:10px 0}
+.navigation-buttons{margin-top:1rem}
+</style>"""
+
+QUOTE_CARD = (
+    '<div class="hl-card hl-quote{numbered}"><span class="hl-mark hl-open">❝</span>'
+    '<div class="hl-text">{number}{hypothesis}</div><span class="hl-mark hl-close">❞</span></div>'
+)
+DETAILS_CARD = '<div class="hl-card hl-details"><b>Dimension:</b> {dimension}{extra}</div>'
+EXPLANATION = "<br><b>Ideological side:</b> {ideological_side}<br><b>Explanation:</b> {explanation}"
+TOPIC_CARD = (
+    '<div class="hl-card hl-topic"><span class="hl-topic-title">Topic: {topic} (ID: {topic_id})</span>{top_term}</div>'
+)
+TOPIC_INFO = (
+    '<div class="topic-info"><h6>Topic: {topic}</h6><div class="topic-stats">'
+    "<p><strong>Top term (more general concept for this topic):</strong> {top_term}</p></div></div>"
+)
+
+_card_cache = OrderedDict()
+_card_cache_lock = threading.Lock()
+
+
+def inject_styles():
+    """Emit the shared stylesheet.
+
+    Streamlit drops every element a rerun does not emit again, so this runs once
+    per rerun, at the top of each page, instead of a <style> block per card.
+    """
+    st.markdown(STYLESHEET, unsafe_allow_html=True)
+
+
+def _cached(key: tuple, render):
+    with _card_cache_lock:
+        if key in _card_cache:
+            _card_cache.move_to_end(key)
+            return _card_cache[key]
+
+    card = render()
+    with _card_cache_lock:
+        _card_cache[key] = card
+        if len(_card_cache) > CARD_CACHE_SIZE:
+            _card_cache.popitem(last=False)
+    return card
+
+
+def _text(value):
+    return html.escape(str(value)) if value is not None else ""
+
+
+def hypothesis_card(
+    run_id: str, version: str, topic_id: str, hypothesis_idx: int, hypothesis: dict, explained: bool = False
+):
+    """HTML of a hypothesis quote and its dimension, cached per (run, version, id, hypothesis_idx).
+
+    `version` is the run's dataset_version, so a run regenerated in place does
+    not get the cards of its previous version.
+    """
+    def render():
+        quote = QUOTE_CARD.format(
+            numbered=" hl-numbered" if explained else "",
+            number=f"{hypothesis_idx + 1}. " if explained else "",
+            hypothesis=_text(hypothesis["hypothesis"]),
+        )
+        extra = ""
+        if explained:
+            extra = EXPLANATION.format(
+                ideological_side=_text(hypothesis.get("ideological_side")),
+                explanation=_text(hypothesis.get("explanation")),
+            )
+        return quote + DETAILS_CARD.format(dimension=_text(hypothesis["dimension"]), extra=extra)
+
+    return _cached((run_id, version, str(topic_id), hypothesis_idx, explained), render)
+
+
+def topic_card(topic: str, topic_id: str, top_term: str = None):
+    top_term_html = f"<br><b>Top term:</b> {_text(top_term)}" if top_term else ""
+    return TOPIC_CARD.format(topic=_text(topic), topic_id=_text(topic_id), top_term=top_term_html)
+
+
+def topic_info(topic: str, top_term: str = None):
+    return TOPIC_INFO.format(topic=_text(topic), top_term=_text(top_term))
@@ -0,0 +1,164 @@
+"""Dataset summary computed once per run version and stored next to it.
+
+Precompute at ingest time with::
+
+    python -m app.summary "app/hypotheses_*.jsonl"
+"""
+import json
+import os
+import tempfile
+from collections import Counter
+
+import pandas as pd
+import streamlit as st
+
+from app.utils import dataset_version, list_runs, run_id_of, topic_hypotheses
+
+SUMMARY_VERSION = 2
+TOP_TERMS_SHOWN = 20
+
+
+def sidecar_path(file_paths: list):
+    if len(file_paths) == 1:
+        return f"{file_paths[0]}.summary.json"
+    return os.path.join(os.path.dirname(file_paths[0]), f"{run_id_of(file_paths[0])}.summary.json")
+
+
+def summarize_records(records):
+    """Summarize topic records in a single pass."""
+    topic_ids = set()
+    topics_with_hypotheses = set()
+    hypotheses_per_topic = Counter()
+    dimensions = Counter()
+    sides = Counter()
+    dimension_sides = {}
+    top_terms = Counter()
+    topics_with_top_term = set()
+
+    for record in records:
+        topic_id = str(record["id"])
+        topic_ids.add(topic_id)
+
+        # Records built from DataFrame rows hold NaN rather than None for a missing top term
+        top_term = record.get("top_term")
+        if isinstance(top_term, str) and top_term and topic_id not in topics_with_top_term:
+            topics_with_top_term.add(topic_id)
+            top_terms[top_term] += 1
+
+        for hypothesis in topic_hypotheses(record):
+            topics_with_hypotheses.add(topic_id)
+            hypotheses_per_topic[topic_id] += 1
+            dimension = hypothesis.get("dimension")
+            side = hypothesis.get("ideological_side")
+            dimensions[dimension] += 1
+            sides[side] += 1
+            dimension_sides.setdefault(dimension, Counter())[side] += 1
+
+    topics_per_count = Counter(hypotheses_per_topic.values())
+    if len(topic_ids) > len(topics_with_hypotheses):
+        topics_per_count[0] = len(topic_ids) - len(topics_with_hypotheses)
+
+    return {
+        "topics": len(topic_ids),
+        "topics_with_hypotheses": len(topics_with_hypotheses),
+        "hypotheses": sum(dimensions.values()),
+        "dimensions": dict(dimensions.most_common()),
+        "ideological_sides": dict(sides.most_common()),
+        "dimension_sides": {dimension: dict(counts) for dimension, counts in dimension_sides.items()},
+        "hypotheses_per_topic": {str(n): count for n, count in sorted(topics_per_count.items())},
+        "top_terms": {
+            "topics_with_top_term": len(topics_with_top_term),
+            "unique": len(top_terms),
+            "most_common": dict(top_terms.most_common(TOP_TERMS_SHOWN)),
+        },
+    }
+
+
+def _iter_jsonl(file_paths: list):
+    for file_path in file_paths:
+        with open(file_path, "r") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def build_summary(file_paths: list):
+    """Compute the summary of a run's JSONL shards and write it to its sidecar file."""
+    summary = {
+        "summary_version": SUMMARY_VERSION,
+        "dataset_version": dataset_version(file_paths),
+        **summarize_records(_iter_jsonl(file_paths)),
+    }
+
+    path = sidecar_path(file_paths)
+    tmp_path = None
+    try:
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(summary, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError:
+        # Read-only data directory, the summary is still returned
+        if tmp_path and os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+    return summary
+
+
+def read_summary(file_paths: list):
+    """Sidecar summary of a run if it matches the current version of its files, else None."""
+    try:
+        with open(sidecar_path(file_paths), "r") as f:
+            summary = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if summary.get("summary_version") != SUMMARY_VERSION:
+        return None
+    if summary.get("dataset_version") != dataset_version(file_paths):
+        return None
+    return summary
+
+
+@st.cache_data(show_spinner=False)
+def _cached_summary(file_paths: list, version: str):
+    return read_summary(file_paths) or build_summary(file_paths)
+
+
+def load_summary(path: str, run_id: str):
+    """Summary of a run, built and stored the first time a version of the run is seen."""
+    file_paths = list_runs(path)[run_id]
+    return _cached_summary(file_paths, dataset_version(file_paths))
+
+
+def summarize_runs(path: str):
+    """Build the summary sidecar of every run found under a file, directory or glob pattern."""
+    for run_id, file_paths in list_runs(path).items():
+        summary = build_summary(file_paths)
+        print(f"{run_id}: {summary['topics']} topics, {summary['hypotheses']} hypotheses")
+
+
+def summary_distributions(summary: dict):
+    """Charts of the per-dimension, per-side and per-topic distributions of a summary."""
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Hypotheses per dimension**")
+        st.bar_chart(pd.DataFrame(summary["dimension_sides"]).T.fillna(0))
+    with col2:
+        st.write("**Hypotheses per topic**")
+        # JSON keys are strings, counts as ints keep the bars in numeric order
+        per_topic = {int(n): count for n, count in summary["hypotheses_per_topic"].items()}
+        st.bar_chart(pd.Series(per_topic, name="topics").sort_index())
+
+    top_terms = summary["top_terms"]
+    sides = ", ".join(f"{side}: {count}" for side, count in summary["ideological_sides"].items())
+    st.write(
+        f"**Ideological sides:** {sides} · "
+        f"**Top terms:** {top_terms['unique']} distinct, covering "
+        f"{top_terms['topics_with_top_term']}/{summary['topics']} topics"
+    )
+
+
+if __name__ == "__main__":
+    from jsonargparse import CLI
+
+    CLI(summarize_runs)
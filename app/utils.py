@@ -1,8 +1,15 @@
+import glob
+import hashlib
 import json
+import os
+import re
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import streamlit as st
-from sklearn.metrics import precision_recall_fscore_support
 
 DIMENSIONS_DESCRIPTIONS = {
     "LRGEN": "supports left/right ideology overall",
@@ -27,15 +34,161 @@ DIMENSIONS_DESCRIPTIONS = {
     "EU_INTEGRATION": "opposes/supports EU integration"
 }
 
+# Shards of a run are named "<run>.part003.jsonl", "<run>_shard_3.jsonl" or
+# "<run>-00003-of-00050.jsonl". Shards without a run prefix take the directory name.
+# A separator is required before part/shard, "counterpart_2.jsonl" is a run of its own.
+SHARD_PATTERN = re.compile(r"^(?P<run>.*?)(?:(?:^|[._-])(?:part|shard)[._-]?\d+|-\d+-of-\d+)$")
+
+
+def dataset_files(path: str):
+    """JSONL files behind a path, which can be a file, a directory or a glob pattern.
+
+    Only *.jsonl files are kept, so summary sidecars and other files next to the
+    data never become runs.
+    """
+    files = []
+    for match in sorted(glob.glob(str(path), recursive=True)):
+        if os.path.isdir(match):
+            files.extend(str(file) for file in sorted(Path(match).rglob("*.jsonl")))
+        elif match.endswith(".jsonl"):
+            files.append(match)
+    # "runs/**" matches a directory and the files in it
+    return list(dict.fromkeys(files))
+
+
+def run_id_of(file_path: str):
+    file_path = Path(file_path)
+    match = SHARD_PATTERN.match(file_path.stem)
+    if not match:
+        return file_path.stem
+    return match.group("run") or file_path.parent.name
+
+
+def list_runs(path: str):
+    """Map each run id to its shard files, the most recently written run last.
+
+    Runs with the same name in different directories are told apart by their
+    directory, e.g. "a/hypotheses" and "b/hypotheses".
+    """
+    groups = {}
+    for file_path in dataset_files(path):
+        groups.setdefault((run_id_of(file_path), str(Path(file_path).parent)), []).append(file_path)
+
+    names = Counter(run for run, _ in groups)
+    qualified = Counter(f"{Path(parent).name}/{run}" for run, parent in groups if names[run] > 1)
+    runs = {}
+    for (run, parent), files in groups.items():
+        if names[run] > 1:
+            name = f"{Path(parent).name}/{run}"
+            run = name if qualified[name] == 1 else f"{Path(parent).as_posix()}/{run}"
+        runs[run] = files
+    return dict(sorted(runs.items(), key=lambda run: max(os.path.getmtime(f) for f in run[1])))
+
+
+def run_selector(path: str, key: str = "run_id"):
+    """Sidebar selector of the runs found under `path`. Returns the selected run id."""
+    runs = list(list_runs(path))
+    if not runs:
+        st.error("No hypotheses file found. Please ensure the file exists")
+        st.stop()
+    return st.sidebar.selectbox("Run", runs, index=len(runs) - 1, key=key)
+
+
+def topic_hypotheses(record: dict):
+    """Hypotheses of a topic record."""
+    # Runs nest the hypotheses of a topic, sampled files have one hypothesis per line
+    if "hypotheses" in record:
+        return record["hypotheses"] or []
+    return [record]
+
+
+def dataset_version(file_paths: list):
+    """Identify a version of the given files without reading them."""
+    versions = []
+    for file_path in file_paths:
+        stat = os.stat(file_path)
+        versions.append(f"{os.path.basename(file_path)}:{stat.st_size}-{stat.st_mtime_ns}")
+    return hashlib.sha1(",".join(versions).encode()).hexdigest()
+
+
+def run_version(path: str, run_id: str):
+    """dataset_version of the files of a run found under `path`."""
+    return dataset_version(list_runs(path)[run_id])
+
+
+def _read_shard(file_path: str):
+    import pyarrow as pa
+    import pyarrow.json as pa_json
+
+    try:
+        # Arrow parses in C++ threads without holding the GIL
+        table = pa_json.read_json(file_path)
+    except pa.ArrowInvalid:
+        # e.g. a field whose type changes between lines
+        with open(file_path, "r") as f:
+            return pd.DataFrame([json.loads(line) for line in f if line.strip()])
+
+    if "hypotheses" not in table.column_names:
+        return table.to_pandas()
+    df = table.drop_columns(["hypotheses"]).to_pandas()
+    # The pages and metrics work on plain lists of hypothesis dicts
+    df["hypotheses"] = table.column("hypotheses").to_pylist()
+    return df
+
+
+def _load_shard(file_path: str, run_id: str):
+    df = _read_shard(file_path)
+    df["run_id"] = run_id
+    df["shard"] = Path(file_path).name
+    return df
+
 
 @st.cache_data(show_spinner=False)
-def load_jsonl_results(file_path):
-    """Load results from JSONL file."""
-    results = []
-    with open(file_path, "r") as f:
-        for line in f:
-            results.append(json.loads(line))
-    return pd.DataFrame(results)
+def _load_files(files: list, run_ids: list, version: str, max_workers: int):
+    if max_workers <= 1:
+        shards = [_load_shard(file, run) for file, run in zip(files, run_ids)]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            shards = list(executor.map(_load_shard, files, run_ids))
+    if len(shards) == 1:
+        return shards[0]
+    return pd.concat(shards, ignore_index=True)
+
+
+def load_jsonl_results(file_path, run_id=None, max_workers=None):
+    """Load results from JSONL file(s), optionally only the shards of one run.
+
+    Shards are parsed with pyarrow, several at a time when there are CPUs to
+    spare, and tagged with `run_id` and `shard` columns. Results are cached per
+    version of the files, so rewritten or added shards are picked up.
+    """
+    runs = list_runs(file_path)
+    if run_id is not None:
+        runs = {run_id: runs.get(run_id, [])}
+    files = [file for files in runs.values() for file in files]
+    run_ids = [run for run, files in runs.items() for _ in files]
+    if not files:
+        raise FileNotFoundError(f"No JSONL files found for {file_path}")
+
+    max_workers = max_workers or min(len(files), os.cpu_count() or 1)
+    return _load_files(files, run_ids, dataset_version(files), max_workers)
+
+
+def micro_precision_recall_f1(y_true, y_pred):
+    """Micro-averaged precision, recall and F1 of two binary indicator matrices.
+
+    Matches ``sklearn.metrics.precision_recall_fscore_support(..., average="micro",
+    zero_division=0)`` without importing scikit-learn.
+    """
+    y_true = np.asarray(y_true, dtype=bool)
+    y_pred = np.asarray(y_pred, dtype=bool)
+
+    tp = int(np.count_nonzero(y_true & y_pred))
+    fp = int(np.count_nonzero(~y_true & y_pred))
+    fn = int(np.count_nonzero(y_true & ~y_pred))
+
+    metrics = _precision_recall_f1(tp, fp, fn)
+    return metrics["precision"], metrics["recall"], metrics["f1"]
 
 
 def calculate_metrics(topics_data, labeled_data):
@@ -44,11 +197,12 @@ def calculate_metrics(topics_data, labeled_data):
         return {"precision": 0, "recall": 0, "f1": 0}
     
     all_dimensions = list(DIMENSIONS_DESCRIPTIONS.keys())
+    topics_by_id = {topic["id"]: topic for topic in topics_data}
     y_true = []
     y_pred = []
     
     for topic_id, user_dimensions in labeled_data.items():
-        topic_entry = next((topic for topic in topics_data if topic["id"] == topic_id), None)
+        topic_entry = topics_by_id.get(topic_id)
         if not topic_entry or "hypotheses" not in topic_entry:
             continue
         
@@ -65,12 +219,76 @@ def calculate_metrics(topics_data, labeled_data):
     if not y_true:
         return {"precision": 0, "recall": 0, "f1": 0}
 
-    precision, recall, f1, _ = precision_recall_fscore_support(
-        y_true, y_pred, average="micro", zero_division=0
-    )
+    precision, recall, f1 = micro_precision_recall_f1(y_true, y_pred)
 
     return {
         "precision": precision,
         "recall": recall,
         "f1": f1
-    }
\ No newline at end of file
+    }
+
+
+def ground_truth_dimensions(topics_data):
+    """Map each topic id to the set of dimensions it has hypotheses for."""
+    return {
+        topic["id"]: {hyp["dimension"] for hyp in topic["hypotheses"]}
+        for topic in topics_data
+        if "hypotheses" in topic
+    }
+
+
+def new_metric_counters():
+    """Per-dimension true positive, false positive and false negative counts, all zero."""
+    n_dimensions = len(DIMENSIONS_DESCRIPTIONS)
+    return {"tp": [0] * n_dimensions, "fp": [0] * n_dimensions, "fn": [0] * n_dimensions}
+
+
+def update_metric_counters(counters, true_dimensions, topic_id, old_selection, new_selection):
+    """Swap a topic's old selection for its new one in the counters.
+
+    `old_selection` is None when the topic was not labeled before.
+    """
+    truth = true_dimensions.get(topic_id)
+    if truth is None:
+        return
+
+    for sign, selection in ((-1, old_selection), (1, new_selection)):
+        if selection is None:
+            continue
+        for i, dimension in enumerate(DIMENSIONS_DESCRIPTIONS):
+            selected = dimension in selection
+            if dimension in truth:
+                counters["tp" if selected else "fn"][i] += sign
+            elif selected:
+                counters["fp"][i] += sign
+
+
+def build_metric_counters(true_dimensions, labeled_data):
+    counters = new_metric_counters()
+    for topic_id, user_dimensions in labeled_data.items():
+        update_metric_counters(counters, true_dimensions, topic_id, None, user_dimensions)
+    return counters
+
+
+def _precision_recall_f1(tp, fp, fn):
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * tp / (2 * tp + fp + fn) if tp else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
+
+
+def metrics_from_counters(counters):
+    """Micro-averaged precision, recall and F1, same as calculate_metrics."""
+    return _precision_recall_f1(sum(counters["tp"]), sum(counters["fp"]), sum(counters["fn"]))
+
+
+def per_dimension_metrics(counters):
+    return {
+        dimension: {
+            **_precision_recall_f1(counters["tp"][i], counters["fp"][i], counters["fn"][i]),
+            "tp": counters["tp"][i],
+            "fp": counters["fp"][i],
+            "fn": counters["fn"][i],
+        }
+        for i, dimension in enumerate(DIMENSIONS_DESCRIPTIONS)
+    }
@@ -1,5 +1,4 @@
 import sys
-import json
 import pandas as pd
 import streamlit as st
 
@@ -8,29 +7,58 @@ from pathlib import Path
 project_root = Path().absolute()
 sys.path.append(str(project_root))
 
+from app.render import hypothesis_card, inject_styles
+from app.summary import load_summary, summary_distributions
+from app.utils import list_runs, load_jsonl_results, run_selector, run_version
 
-@st.cache_data(show_spinner=False)
-def load_jsonl_results(file_path):
-    """Load results from JSONL file."""
-    results = []
-    with open(file_path, "r") as f:
-        for line in f:
-            results.append(json.loads(line))
-    return pd.DataFrame(results)
+
+def run_diff_view(hypotheses_file: str, run_id: str, compare_run_id: str, topic_ids):
+    """Changes from `compare_run_id` to `run_id`, per dimension and for the shown topics."""
+    from app.diff import changed_rows, compare_runs
+
+    diff, stats = compare_runs(hypotheses_file, compare_run_id, run_id)
+
+    with st.expander(f"🔀 Changes from {compare_run_id} to {run_id}", expanded=True):
+        col1, col2 = st.columns([1, 1])
+        with col1:
+            st.dataframe(stats, use_container_width=True)
+        with col2:
+            st.bar_chart(stats.drop(columns="unchanged"))
+
+        changes = changed_rows(diff)
+        changes = changes[changes["id"].isin(topic_ids)]
+        if changes.empty:
+            st.info("No changes for this topic")
+        else:
+            st.dataframe(
+                changes[[
+                    "dimension", "status", "side_flipped", "rewritten",
+                    "ideological_side_old", "ideological_side_new", "hypothesis_old", "hypothesis_new",
+                ]],
+                hide_index=True,
+                use_container_width=True,
+            )
 
 
 def main(
     hypotheses_file: str = "app/hypotheses_09_04_2025_10_38_54.jsonl",
 ):
     st.set_page_config(page_title="Topic Hypotheses", page_icon="💡", layout="wide")
+    inject_styles()
 
     st.title("💡 Topic hypotheses")
 
-    if not Path(hypotheses_file).exists():
-        st.error("No hypotheses file found. Please ensure the file exists")
-        return
+    run_id = run_selector(hypotheses_file)
+    other_runs = [run for run in list_runs(hypotheses_file) if run != run_id]
+    compare_run_id = st.sidebar.selectbox("Compare with run", [None, *other_runs], format_func=lambda run: run or "None")
+    df_topic_hypotheses = load_jsonl_results(hypotheses_file, run_id)
+    version = run_version(hypotheses_file, run_id)
 
-    df_topic_hypotheses = load_jsonl_results(hypotheses_file)
+    summary = load_summary(hypotheses_file, run_id)
+    with st.expander(
+        f"📊 Dataset summary: {summary['topics']} topics, {summary['hypotheses']} hypotheses"
+    ):
+        summary_distributions(summary)
 
     all_topics = sorted(df_topic_hypotheses["topic"].unique())
     selected_topic = st.selectbox(
@@ -67,21 +95,15 @@ def main(
     else:
         df_hypotheses_to_show = df_topic_hypotheses
 
+    if compare_run_id:
+        run_diff_view(hypotheses_file, run_id, compare_run_id, df_hypotheses_to_show["id"].astype(str))
+
     for _, row in df_hypotheses_to_show.iterrows():
         col1, col2 = st.columns([1, 2])
         with col1:
             if pd.isna(row["top_term"]):
                 st.markdown(
-                    f"""
-                    ###### {row['topic']} (ID: {row['id']}) 
-                    <span style='
-                        background-color: #2E9BF5;
-                        color: white;
-                        padding: 2px 8px;
-                        border-radius: 10px;
-                        font-size: 0.8em;
-                    '>TOP TERM</span>
-                    """,
+                    f"###### {row['topic']} (ID: {row['id']}) <span class='hl-badge'>TOP TERM</span>",
                     unsafe_allow_html=True
                 )
             else:
@@ -91,73 +113,12 @@ def main(
             if pd.notna(row["top_term"]):
                 st.markdown(f"###### General concept: {row['top_term']}")
 
-        with st.container():
-            for i, hypothesis in enumerate(row["hypotheses"]):
-                st.markdown(
-                    f"""
-                <div style='
-                    background-color: #f8f9fa;
-                    padding: 20px;
-                    border-radius: 10px;
-                    margin: 10px 0;
-                    border-left: 5px solid #2E9BF5;
-                    position: relative;
-                '>
-                    <div style='
-                        font-size: 24px;
-                        color: #2E9BF5;
-                        position: absolute;
-                        top: 10px;
-                        left: 10px;
-                    '>❝</div>
-                    <div style='
-                        padding-left: 25px;
-                        padding-top: 10px;
-                        font-style: italic;
-                        color: #2E9BF5;
-                        font-size: 1.1em;
-                    '>
-                        {i+1}. {hypothesis['hypothesis']}
-                    </div>
-                    <div style='
-                        font-size: 24px;
-                        color: #2E9BF5;
-                        position: absolute;
-                        bottom: 0;
-                        right: 20px;
-                    '>❞</div>
-                </div>
-                """,
-                    unsafe_allow_html=True,
-                )
-
-                st.markdown(
-                    f"""
-                <div style='
-                    background-color: #f8f9fa;
-                    padding: 20px;
-                    border-radius: 10px;
-                    margin: 10px 0;
-                    border-left: 5px solid #229954;
-                '>
-                    <div style='
-                        color: #1a1a1a;
-                        font-size: 1em;
-                        line-height: 1.6;
-                    '>
-                        <span style='font-weight: bold;'>Dimension:</span>
-                        {hypothesis['dimension']}
-                        <br>
-                        <span style='font-weight: bold;'>Ideological side:</span>
-                        {hypothesis['ideological_side']}
-                        <br>
-                        <span style='font-weight: bold;'>Explanation:</span>
-                        {hypothesis['explanation']}
-                    </div>
-                </div>
-                """,
-                    unsafe_allow_html=True,
-                )
+        # One element per topic instead of two per hypothesis
+        cards = "".join(
+            hypothesis_card(run_id, version, row["id"], i, hypothesis, explained=True)
+            for i, hypothesis in enumerate(row["hypotheses"])
+        )
+        st.markdown(cards, unsafe_allow_html=True)
         st.markdown("---")
 
 